@@ -1,68 +1,242 @@
+import base64
+import hashlib
+import io
+import math
 import os
 import json
+import re
 import time
 import smtplib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
-from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from itertools import islice
+import sys
 from pathlib import Path
-from urllib.parse import quote
+from urllib.parse import urlsplit, urlunsplit
+from xml.etree.ElementTree import ParseError, iterparse
 
-import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # Aho-Corasick automaton: O(len(title)) scan no matter how many terms
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # C serializer; emits UTF-8 bytes directly, no intermediate str/encode
+    import orjson
+except ImportError:
+    orjson = None
+
+# feeds_catalog.py lives at the repo root, two levels up from .github/workflows
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import feeds_catalog
 
 BASE_DIR = Path(__file__).resolve().parent
 STATE_PATH = BASE_DIR / "state.json"
 OUTPUT_DIR = BASE_DIR / "output"
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+USER_AGENT = "yms-reddit-digest/1.0"
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+def fetch_feed_bodies(urls: list[str], feed_cache: dict) -> list[bytes | None]:
+    # I/O-bound: threads collapse sum(per-feed RTT) into roughly max(RTT).
+    # feed_cache (url -> etag/last_modified, persisted in state.json) lets
+    # Reddit answer 304 for unchanged feeds so we skip download and parse.
+    session = make_session()
+
+    def fetch(url: str) -> bytes | None:
+        headers = {}
+        cached = feed_cache.get(url) or {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            resp = session.get(url, headers=headers, timeout=30)
+            if resp.status_code == 304:
+                return None
+            resp.raise_for_status()
+        except requests.RequestException:
+            return None
+        meta = {}
+        if resp.headers.get("ETag"):
+            meta["etag"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            meta["last_modified"] = resp.headers["Last-Modified"]
+        if meta:
+            feed_cache[url] = meta
+        return resp.content
+
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        return list(executor.map(fetch, urls))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter for the long-tail dedup window.
+
+    16 KiB of bits (~1%% false positives at 10k ids) instead of a growing
+    JSON list; a false positive only means one lead is not emailed. The
+    filter is reset when it fills past half, which is safe because min_ts
+    already bounds how far back entries are collected.
+    """
+
+    M_BITS = 2 ** 17
+    K = 7
+
+    def __init__(self, bits: bytearray | None = None):
+        self.bits = bits if bits is not None else bytearray(self.M_BITS // 8)
+
+    def _hashes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little")
+        mask = self.M_BITS - 1
+        for i in range(self.K):
+            yield (h1 + i * h2) & mask
+
+    def add(self, key: str) -> None:
+        for h in self._hashes(key):
+            self.bits[h >> 3] |= 1 << (h & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[h >> 3] & (1 << (h & 7)) for h in self._hashes(key))
+
+    @classmethod
+    def load(cls, encoded) -> "BloomFilter":
+        if not encoded:
+            return cls()
+        bits = bytearray(base64.b64decode(encoded))
+        if len(bits) != cls.M_BITS // 8:
+            return cls()
+        if sum(b.bit_count() for b in bits) > cls.M_BITS // 2:
+            return cls()
+        return cls(bits)
+
+    def dump(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode("ascii")
+
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
+def dumps_bytes(obj) -> bytes:
+    # compact machine-read JSON as UTF-8 bytes, via orjson when available
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 def load_state() -> dict:
     if STATE_PATH.exists():
-        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+        raw = STATE_PATH.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
     return {}
 
 def save_state(state: dict) -> None:
-    STATE_PATH.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    # temp file + os.replace is atomic on POSIX, so a crash mid-write can
+    # never leave a truncated state.json; compact output because the
+    # seen-id blobs are machine-read only
+    tmp = STATE_PATH.with_suffix(".json.tmp")
+    tmp.write_bytes(dumps_bytes(state))
+    os.replace(tmp, STATE_PATH)
 
 def iso(ts: float) -> str:
     return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
 
-def hours_ago(ts: float) -> int:
-    return int((utc_now().timestamp() - ts) // 3600)
-
-def parse_entry_time(entry) -> float:
-    if hasattr(entry, "published_parsed") and entry.published_parsed:
-        return time.mktime(entry.published_parsed)
-    if hasattr(entry, "updated_parsed") and entry.updated_parsed:
-        return time.mktime(entry.updated_parsed)
+def hours_ago(ts: float, now_ts: float | None = None) -> int:
+    # callers in hot loops pass now_ts once instead of re-reading the clock
+    if now_ts is None:
+        now_ts = time.time()
+    return int((now_ts - ts) // 3600)
+
+def canon_key(eid: str, link: str) -> str:
+    # same post, different query params per search feed: dedup on the bare
+    # scheme+host+path as a compact 16-byte blake2b hex digest
+    s = urlsplit(link or eid)
+    base = urlunsplit((s.scheme, s.netloc, s.path, "", ""))
+    return hashlib.blake2b(base.encode("utf-8"), digest_size=16).hexdigest()
+
+def parse_ts(s: str | None) -> float:
+    # ISO (Atom) or RFC 822 (RSS) date string, both C-backed stdlib paths
+    if s:
+        try:
+            dt = datetime.fromisoformat(s)
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(s)
+            except (TypeError, ValueError):
+                return time.time()
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
     return time.time()
 
-def mk_feed_url(query: str) -> str:
-    q = quote(query)
-    return f"https://www.reddit.com/search.rss?q={q}&sort=new&t=week"
+def stream_entries(body: bytes):
+    # streaming Atom parse: run() only needs these four fields, and an
+    # early break in the caller stops the XML walk immediately. Malformed
+    # bodies (truncated, HTML with HTTP 200) end the stream instead of
+    # aborting the run
+    try:
+        for _, elem in iterparse(io.BytesIO(body), events=("end",)):
+            if elem.tag.rpartition("}")[2] != "entry":
+                continue
+            eid = link = title = published = updated = None
+            for child in elem:
+                tag = child.tag.rpartition("}")[2]
+                if tag == "id":
+                    eid = child.text
+                elif tag == "link":
+                    link = child.get("href") or child.text
+                elif tag == "title":
+                    title = child.text
+                elif tag == "published":
+                    published = child.text
+                elif tag == "updated":
+                    updated = child.text
+            elem.clear()
+            yield {"id": eid, "link": link, "title": title, "ts": parse_ts(published or updated)}
+    except ParseError:
+        return
+
+# (display name, feeds_catalog key); queries and buckets come from the
+# shared catalog so both variants stay in sync
+_FEED_KEYS = (
+        ("Beginner paypig", "beginner_paypig"),
+        ("Findom slave", "findom_slave"),
+        ("TeamViewer", "teamviewer"),
+        ("Beginner findomme", "beginner_findomme_broad"),
+        ("Platforms", "platforms_broad"),
+        ("Attract paypigs", "attract_paypigs"),
+        ("What is findom", "what_is_findom"),
+        ("Femdom movies tv", "femdom_movies_tv"),
+        ("Manga comics", "manga_comics"),
+        ("Telegram", "telegram_broad"),
+        ("Forum", "findom_forum"),
+)
+
+# (bucket, name, query) — built once at import, URLs pre-quoted below
+_FEEDS: tuple[tuple[str, str, str], ...] = tuple(
+        (feeds_catalog.QUERIES[key][0], name, feeds_catalog.QUERIES[key][1])
+        for name, key in _FEED_KEYS
+)
+
+_FEED_URLS: tuple[str, ...] = tuple(feeds_catalog.feed_url(q) for _, _, q in _FEEDS)
 
 def build_feeds() -> list[tuple[str, str, str]]:
-    # (bucket, name, query)
-    return [
-        ("PAYPIG", "Beginner paypig", "paypig OR \"pay pig\" AND (beginner OR start OR advice OR help OR safe OR boundaries)"),
-        ("PAYPIG", "Findom slave", "\"findom slave\" OR \"financial domination\" AND (rules OR boundaries OR addicted OR addiction OR shame OR guilt)"),
-        ("PAYPIG", "TeamViewer", "teamviewer AND (findom OR femdom)"),
-
-        ("FINDOMME", "Beginner findomme", "findomme AND (beginner OR start OR advice OR help OR \"how do\" OR mistakes)"),
-        ("FINDOMME", "Platforms", "(loyalfans OR fansly OR onlyfans) AND (findom OR femdom OR findomme OR domme)"),
-        ("FINDOMME", "Attract paypigs", "(attract OR marketing OR \"get subs\" OR \"find paypigs\") AND (findomme OR domme OR findom)"),
-
-        ("CURIOSITY", "What is findom", "(findom OR \"financial domination\") AND (\"what is\" OR normal OR \"is it\" OR psychology)"),
-
-        ("MEDIA", "Femdom movies tv", "\"femdom movies\" OR \"femdom tv\" OR \"mainstream femdom\""),
-        ("MEDIA", "Manga comics", "\"findom manga\" OR \"findom comic\" OR \"findom comics\" OR doujin"),
-        ("COMMUNITY", "Telegram", "findom telegram OR \"findom telegram group\" OR \"findom telegram channel\""),
-        ("COMMUNITY", "Forum", "findom forum OR \"financial domination forum\""),
-    ]
-
-def classify_title(title: str) -> str:
-    t = title.lower()
+    return list(_FEEDS)
+
+def classify_title(t: str) -> str:
+    # t must already be lowercased by the caller
     if any(k in t for k in ["findomme", "domme", "loyalfans", "fansly", "onlyfans"]):
         return "FINDOMME"
     if any(k in t for k in ["paypig", "pay pig", "findom slave"]):
@@ -71,29 +245,48 @@ def classify_title(title: str) -> str:
         return "MEDIA"
     return "CURIOSITY"
 
-def score_item(title: str, bucket: str) -> tuple[int, list[str]]:
-    t = title.lower()
+# one compiled alternation scans the title once in C instead of one
+# Python substring check per term
+_SCORE_TERMS = [
+    ("beginner", 2, "beginner"),
+    ("start", 1, "start"),
+    ("how to", 2, "how-to"),
+    ("advice", 1, "advice"),
+    ("help", 1, "help"),
+    ("platform", 2, "platform"),
+    ("loyalfans", 2, "loyalfans"),
+    ("teamviewer", 2, "teamviewer"),
+    ("telegram", 1, "telegram"),
+    ("addict", 2, "addiction"),
+    ("boundar", 2, "boundaries"),
+]
+_SCORE_TABLE = {term: (pts, label) for term, pts, label in _SCORE_TERMS}
+if ahocorasick is not None:
+    _SCORE_AC = ahocorasick.Automaton()
+    for _term, (_pts, _label) in _SCORE_TABLE.items():
+        _SCORE_AC.add_word(_term, (_term, _pts, _label))
+    _SCORE_AC.make_automaton()
+else:
+    _SCORE_AC = None
+_SCORE_RE = re.compile("|".join(re.escape(t) for t in sorted(_SCORE_TABLE, key=len, reverse=True)))
+
+def score_item(t: str, bucket: str) -> tuple[int, list[str]]:
+    # t arrives pre-lowercased from the caller
     score = 0
     reasons = []
 
-    if "?" in title:
+    if "?" in t:
         score += 3
         reasons.append("question")
 
-    for term, pts, label in [
-        ("beginner", 2, "beginner"),
-        ("start", 1, "start"),
-        ("how to", 2, "how-to"),
-        ("advice", 1, "advice"),
-        ("help", 1, "help"),
-        ("platform", 2, "platform"),
-        ("loyalfans", 2, "loyalfans"),
-        ("teamviewer", 2, "teamviewer"),
-        ("telegram", 1, "telegram"),
-        ("addict", 2, "addiction"),
-        ("boundar", 2, "boundaries"),
-    ]:
-        if term in t:
+    matched = set()
+    if _SCORE_AC is not None:
+        hits = (payload for _, payload in _SCORE_AC.iter(t))
+    else:
+        hits = ((m.group(0), *_SCORE_TABLE[m.group(0)]) for m in _SCORE_RE.finditer(t))
+    for term, pts, label in hits:
+        if term not in matched:
+            matched.add(term)
             score += pts
             reasons.append(label)
 
@@ -103,63 +296,115 @@ def score_item(title: str, bucket: str) -> tuple[int, list[str]]:
 
     return score, reasons[:5]
 
-def send_email(subject: str, body: str) -> None:
-    host = os.environ["SMTP_HOST"]
-    port = int(os.environ.get("SMTP_PORT", "587"))
-    user = os.environ["SMTP_USER"]
-    pwd = os.environ["SMTP_PASS"]
-    mail_to = os.environ["MAIL_TO"]
-    mail_from = os.environ.get("MAIL_FROM", user)
-
-    msg = MIMEText(body, "plain", "utf-8")
-    msg["Subject"] = subject
-    msg["From"] = mail_from
-    msg["To"] = mail_to
-
-    with smtplib.SMTP(host, port) as s:
-        s.starttls()
-        s.login(user, pwd)
-        s.sendmail(mail_from, [mail_to], msg.as_string())
+_TOKEN_RE = re.compile(r"[a-z]+")
+_TFIDF_VOCAB = frozenset(tok for term, _, _ in _SCORE_TERMS for tok in _TOKEN_RE.findall(term))
+
+def add_priority(items: list[dict]) -> None:
+    # per-run TF-IDF over the hot-term vocabulary: rare high-signal terms
+    # outrank ubiquitous ones when breaking score ties for the top slots
+    if not items:
+        return
+    token_counts = []
+    df = Counter()
+    for it in items:
+        toks = Counter(tok for tok in _TOKEN_RE.findall(it["title"].lower()) if tok in _TFIDF_VOCAB)
+        token_counts.append(toks)
+        df.update(toks.keys())
+    n = len(items)
+    idf = {tok: math.log((n + 1) / (c + 1)) + 1 for tok, c in df.items()}
+    for it, toks in zip(items, token_counts):
+        pr = sum(tf * idf[tok] for tok, tf in toks.items())
+        if "?" in it["title"]:
+            pr += 2
+        it["priority"] = round(pr, 3)
+
+class SmtpSession:
+    # connect + starttls + login once per run; send() can then be called
+    # any number of times on the same connection
+    def __enter__(self) -> "SmtpSession":
+        host = os.environ["SMTP_HOST"]
+        port = int(os.environ.get("SMTP_PORT", "587"))
+        user = os.environ["SMTP_USER"]
+        pwd = os.environ["SMTP_PASS"]
+        # MAIL_TO may be a comma-separated list; split once, send once
+        self.mail_to = [a.strip() for a in os.environ["MAIL_TO"].split(",") if a.strip()]
+        self.mail_from = os.environ.get("MAIL_FROM", user)
+
+        self.server = smtplib.SMTP(host, port)
+        self.server.starttls()
+        self.server.login(user, pwd)
+        return self
+
+    def send(self, subject: str, body: str) -> None:
+        msg = MIMEText(body, "plain", "utf-8")
+        msg["Subject"] = subject
+        msg["From"] = self.mail_from
+        msg["To"] = ", ".join(self.mail_to)
+        # bytes serialization + one DATA phase for all recipients
+        self.server.send_message(msg, self.mail_from, self.mail_to)
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            pass
 
 def run():
     state = load_state()
-    seen = set(state.get("seen_ids", []))
-
+    # two dedup layers: a small precise window of recent keys (deque+set)
+    # and a Bloom filter holding the long tail at constant size; starts
+    # empty on first migration (old raw ids can't map to canon_key) and
+    # min_ts bounds any re-collection
+    seen_bloom = BloomFilter.load(state.get("seen_bloom"))
+    seen_order = deque(state.get("seen_ids", []), maxlen=500)
+    seen = set(seen_order)
+
+    now_ts = time.time()
     last_run_ts = float(state.get("last_run_utc_ts") or 0)
     backfill_hours = int(os.environ.get("BACKFILL_HOURS", "168"))
-    min_ts = max(last_run_ts, (utc_now() - timedelta(hours=backfill_hours)).timestamp())
+    min_ts = max(last_run_ts, now_ts - backfill_hours * 3600)
 
     max_items = int(os.environ.get("MAX_ITEMS_PER_RUN", "120"))
 
     collected = []
     feeds = build_feeds()
-
-    for bucket, name, query in feeds:
-        url = mk_feed_url(query)
-        d = feedparser.parse(url)
-
-        for entry in d.entries[:200]:
-            eid = getattr(entry, "id", None) or getattr(entry, "link", None)
-            if not eid or eid in seen:
+    feed_cache = state.get("feed_cache") or {}
+    bodies = fetch_feed_bodies(list(_FEED_URLS), feed_cache)
+
+    # per-feed cap: each feed's share of max_items with 2x headroom
+    per_feed_cap = max(12, 2 * (max_items // max(1, len(feeds))))
+
+    for (bucket, name, query), body in zip(feeds, bodies):
+        if body is None:
+            continue
+        for entry in islice(stream_entries(body), per_feed_cap):
+            eid = entry["id"] or entry["link"]
+            if not eid:
+                continue
+            key = canon_key(eid, entry["link"] or "")
+            if key in seen or key in seen_bloom:
                 continue
 
-            created_ts = parse_entry_time(entry)
+            created_ts = entry["ts"]
             if created_ts < min_ts:
-                continue
+                # search.rss is sorted newest-first (sort=new), so every
+                # entry after this one is older still
+                break
 
-            title = (getattr(entry, "title", "") or "").strip()
-            link = (getattr(entry, "link", "") or "").strip()
+            title = (entry["title"] or "").strip()
+            link = (entry["link"] or "").strip()
             if not title or not link:
                 continue
 
-            predicted = classify_title(title)
-            score, reasons = score_item(title, bucket)
+            t_lower = title.lower()
+            predicted = classify_title(t_lower)
+            score, reasons = score_item(t_lower, bucket)
 
             item = {
                 "id": eid,
                 "created_utc": created_ts,
                 "created_iso": iso(created_ts),
-                "age_hours": hours_ago(created_ts),
+                "age_hours": hours_ago(created_ts, now_ts),
                 "bucket": bucket,
                 "predicted": predicted,
                 "feed": name,
@@ -170,46 +415,61 @@ def run():
             }
 
             collected.append(item)
-            seen.add(eid)
+            seen.add(key)
+            seen_order.append(key)
+            seen_bloom.add(key)
 
             if len(collected) >= max_items:
                 break
         if len(collected) >= max_items:
             break
 
-    collected.sort(key=lambda x: (x["score"], -x["age_hours"]), reverse=True)
-
-    run_stamp = utc_now().strftime("%Y%m%d_%H%M%S")
-    out_path = OUTPUT_DIR / f"queue_{run_stamp}.json"
-    out_path.write_text(json.dumps(collected, indent=2), encoding="utf-8")
-
+    add_priority(collected)
+    collected.sort(key=lambda x: (x["score"], x["priority"], -x["age_hours"]), reverse=True)
+
+    now_dt = utc_now()
+    # daily NDJSON rollup, append-only: serialization stays O(new items)
+    # per run and readers can stream it line by line
+    out_path = OUTPUT_DIR / f"queue_{now_dt.strftime('%Y%m%d')}.ndjson"
+    with out_path.open("ab") as fp:
+        for it in collected:
+            fp.write(dumps_bytes(it) + b"\n")
+
+    # opt-in full per-run snapshot in the old format
+    if os.getenv("FULL_SNAPSHOT"):
+        snap_path = OUTPUT_DIR / f"queue_{now_dt.strftime('%Y%m%d_%H%M%S')}.json"
+        if os.getenv("DEBUG_JSON"):
+            with snap_path.open("w", encoding="utf-8") as fp:
+                json.dump(collected, fp, indent=2)
+        else:
+            snap_path.write_bytes(dumps_bytes(collected))
+
+    # one f-string header plus a joined per-item generator: no line list
     top = collected[:20]
-    lines = []
-    lines.append("YMS Reddit leads, pick 3 and reply with value. Usually no links in the comment.")
-    lines.append("")
-    lines.append(f"New items: {len(collected)}")
-    lines.append(f"Saved queue: {out_path}")
-    lines.append("")
-    lines.append("HIGH PRIORITY")
-    lines.append("")
-
-    shown = 0
-    for it in top:
-        shown += 1
-        lines.append(f"{shown}. {it['bucket']} lead, {it['feed']}")
-        lines.append(f"   Age: {it['age_hours']}h, Score: {it['score']}, Signals: {', '.join(it['reasons'])}")
-        lines.append(f"   Title: {it['title']}")
-        lines.append(f"   Link:  {it['url']}")
-        lines.append("   Suggested action: reply with 3 to 6 sentences, add 1 question at the end, avoid selling.")
-        lines.append("")
-
-    if len(collected) == 0:
-        lines.append("No new items in the selected backfill window.")
+    header = (
+        "YMS Reddit leads, pick 3 and reply with value. Usually no links in the comment.\n\n"
+        f"New items: {len(collected)}\n"
+        f"Saved queue: {out_path}\n\n"
+        "HIGH PRIORITY\n\n"
+    )
+    items_text = "\n".join(
+        f"{i}. {it['bucket']} lead, {it['feed']}\n"
+        f"   Age: {it['age_hours']}h, Score: {it['score']}, Signals: {', '.join(it['reasons'])}\n"
+        f"   Title: {it['title']}\n"
+        f"   Link:  {it['url']}\n"
+        "   Suggested action: reply with 3 to 6 sentences, add 1 question at the end, avoid selling.\n"
+        for i, it in enumerate(top, start=1)
+    )
+    if not collected:
+        items_text = "No new items in the selected backfill window."
 
     subject = f"YMS Reddit leads: {len(collected)} new items"
-    send_email(subject, "\n".join(lines))
+    with SmtpSession() as smtp:
+        smtp.send(subject, header + items_text)
 
-    state["seen_ids"] = list(seen)[-10000:]
+    state["seen_ids"] = list(seen_order)
+    state["seen_bloom"] = seen_bloom.dump()
+    state["feed_cache"] = feed_cache
     state["last_run_utc_ts"] = time.time()
     save_state(state)
 
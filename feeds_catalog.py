@@ -0,0 +1,36 @@
+"""Canonical catalog of the Reddit search queries used by the digest scripts.
+
+rss_digest.py and the workflow copy used to carry near-identical query
+lists, which meant overlapping feeds (e.g. "findom telegram") were
+defined, fetched and tuned in several places. The union lives here;
+each variant picks the keys it wants. Combined with the per-URL ETag
+cache in state.json, two variants running close together get 304s for
+the shared feeds instead of full downloads.
+"""
+
+from urllib.parse import quote_plus
+
+# key -> (bucket, query)
+QUERIES: dict[str, tuple[str, str]] = {
+    "findom_general": ("GENERAL", 'findom OR "financial domination"'),
+    "paypig": ("PAYPIG", 'paypig OR "pay pig"'),
+    "beginner_paypig": ("PAYPIG", 'paypig OR "pay pig" AND (beginner OR start OR advice OR help OR safe OR boundaries)'),
+    "findom_slave": ("PAYPIG", '"findom slave" OR "financial domination" AND (rules OR boundaries OR addicted OR addiction OR shame OR guilt)'),
+    "teamviewer": ("PAYPIG", 'teamviewer AND (findom OR femdom)'),
+    "beginner_findomme": ("FINDOMME", '"beginner findomme" OR "new findomme" OR "starting findom"'),
+    "beginner_findomme_broad": ("FINDOMME", 'findomme AND (beginner OR start OR advice OR help OR "how do" OR mistakes)'),
+    "platforms": ("FINDOMME", '"findom platform" OR loyalfans OR fansly OR onlyfans'),
+    "platforms_broad": ("FINDOMME", '(loyalfans OR fansly OR onlyfans) AND (findom OR femdom OR findomme OR domme)'),
+    "attract_paypigs": ("FINDOMME", '(attract OR marketing OR "get subs" OR "find paypigs") AND (findomme OR domme OR findom)'),
+    "what_is_findom": ("CURIOSITY", '(findom OR "financial domination") AND ("what is" OR normal OR "is it" OR psychology)'),
+    "femdom_movies_tv": ("MEDIA", '"femdom movies" OR "femdom tv" OR "mainstream femdom"'),
+    "manga_comics": ("MEDIA", '"findom manga" OR "findom comic" OR "findom comics" OR doujin'),
+    "telegram": ("COMMUNITY", 'findom telegram OR "findom telegram group"'),
+    "telegram_broad": ("COMMUNITY", 'findom telegram OR "findom telegram group" OR "findom telegram channel"'),
+    "findom_stories": ("GENERAL", '"findom stories" OR "paypig stories"'),
+    "findom_forum": ("COMMUNITY", '"findom forum" OR "financial domination forum"'),
+}
+
+
+def feed_url(query: str) -> str:
+    return f"https://www.reddit.com/search.rss?q={quote_plus(query)}&sort=new&t=week"
@@ -1,77 +1,275 @@
+import base64
+import hashlib
+import io
+import math
 import os
 import json
+import re
 import time
 import smtplib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from email.mime.text import MIMEText
+from email.utils import parsedate_to_datetime
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta, timezone
+from html import escape as esc
+from string import Template
+from datetime import datetime, timezone
 from pathlib import Path
-from urllib.parse import quote_plus
+from urllib.parse import urlsplit, urlunsplit
+from xml.etree.ElementTree import ParseError, iterparse
 
-import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # Aho-Corasick automaton: O(len(title)) scan no matter how many terms
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # C serializer; emits UTF-8 bytes directly, no intermediate str/encode
+    import orjson
+except ImportError:
+    orjson = None
+
+import feeds_catalog
 
 BASE_DIR = Path(__file__).resolve().parent
 STATE_PATH = BASE_DIR / "state.json"
 OUTPUT_DIR = BASE_DIR / "output"
 OUTPUT_DIR.mkdir(exist_ok=True)
 
+USER_AGENT = "yms-reddit-digest/1.0"
+
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def fetch_feed_bodies(urls: list[str], feed_cache: dict) -> list[bytes | None]:
+    """Fetch all feeds concurrently; parsing stays in the caller's thread.
+
+    Fetching is pure I/O (Reddit HTTPS RTT), so a thread pool collapses
+    sum(per-feed latency) into roughly max(per-feed latency).
+
+    feed_cache maps url -> {"etag": ..., "last_modified": ...} and is
+    persisted in state.json; a 304 response means the feed is unchanged
+    and we skip downloading and parsing it entirely.
+    """
+    session = make_session()
+
+    def fetch(url: str) -> bytes | None:
+        headers = {}
+        cached = feed_cache.get(url) or {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            resp = session.get(url, headers=headers, timeout=30)
+            if resp.status_code == 304:
+                return None
+            resp.raise_for_status()
+        except requests.RequestException:
+            return None
+        meta = {}
+        if resp.headers.get("ETag"):
+            meta["etag"] = resp.headers["ETag"]
+        if resp.headers.get("Last-Modified"):
+            meta["last_modified"] = resp.headers["Last-Modified"]
+        if meta:
+            feed_cache[url] = meta
+        return resp.content
+
+    # cap workers to stay polite to reddit.com
+    with ThreadPoolExecutor(max_workers=min(8, len(urls))) as executor:
+        return list(executor.map(fetch, urls))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter for the long-tail dedup window.
+
+    16 KiB of bits (~1%% false positives at 10k ids) instead of a growing
+    JSON list; a false positive only means one lead is not emailed. The
+    filter is reset when it fills past half, which is safe because min_ts
+    already bounds how far back entries are collected.
+    """
+
+    M_BITS = 2 ** 17
+    K = 7
+
+    def __init__(self, bits: bytearray | None = None):
+        self.bits = bits if bits is not None else bytearray(self.M_BITS // 8)
+
+    def _hashes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little")
+        mask = self.M_BITS - 1
+        for i in range(self.K):
+            yield (h1 + i * h2) & mask
+
+    def add(self, key: str) -> None:
+        for h in self._hashes(key):
+            self.bits[h >> 3] |= 1 << (h & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[h >> 3] & (1 << (h & 7)) for h in self._hashes(key))
+
+    @classmethod
+    def load(cls, encoded) -> "BloomFilter":
+        if not encoded:
+            return cls()
+        bits = bytearray(base64.b64decode(encoded))
+        if len(bits) != cls.M_BITS // 8:
+            return cls()
+        if sum(b.bit_count() for b in bits) > cls.M_BITS // 2:
+            return cls()
+        return cls(bits)
+
+    def dump(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode("ascii")
+
 
 def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def dumps_bytes(obj) -> bytes:
+    # compact machine-read JSON as UTF-8 bytes, via orjson when available
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
 def load_state() -> dict:
     if STATE_PATH.exists():
-        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+        raw = STATE_PATH.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
     return {}
 
 
 def save_state(state: dict) -> None:
-    STATE_PATH.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    # temp file + os.replace is atomic on POSIX, so a crash mid-write can
+    # never leave a truncated state.json; compact output because the
+    # seen-id blobs are machine-read only
+    tmp = STATE_PATH.with_suffix(".json.tmp")
+    tmp.write_bytes(dumps_bytes(state))
+    os.replace(tmp, STATE_PATH)
 
 
 def iso(ts: float) -> str:
     return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
 
 
-def parse_entry_time(entry) -> float:
-    if hasattr(entry, "published_parsed") and entry.published_parsed:
-        return time.mktime(entry.published_parsed)
-    if hasattr(entry, "updated_parsed") and entry.updated_parsed:
-        return time.mktime(entry.updated_parsed)
+def canon_key(eid: str, link: str) -> str:
+    # the same post surfaces under several search queries with different
+    # query params embedded in its id/link, so dedup on the bare
+    # scheme+host+path; the 16-byte blake2b hex digest is ~4x smaller in
+    # state.json than the raw permalink
+    s = urlsplit(link or eid)
+    base = urlunsplit((s.scheme, s.netloc, s.path, "", ""))
+    return hashlib.blake2b(base.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def parse_ts(s: str | None) -> float:
+    # ISO (Atom) or RFC 822 (RSS) date string, both parsed by C-backed
+    # stdlib paths instead of feedparser's format-guessing chain
+    if s:
+        try:
+            dt = datetime.fromisoformat(s)
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(s)
+            except (TypeError, ValueError):
+                return time.time()
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
     return time.time()
 
 
-def hours_ago(ts: float) -> int:
-    return max(0, int((utc_now().timestamp() - ts) // 3600))
+def stream_entries(body: bytes):
+    """Yield one {"id", "link", "title", "ts"} dict per Atom <entry>.
+
+    run() only ever reads these four fields, so a streaming iterparse
+    that clears each element after use replaces feedparser's full
+    normalization pass and bounds memory to one entry at a time. A
+    caller that breaks early (max_items, min_ts cutoff) stops the XML
+    walk right there. A body that is not well-formed XML (truncated
+    response, HTML interstitial served with HTTP 200) ends the stream
+    after whatever parsed cleanly, so one bad feed degrades to skipped
+    like a failed fetch instead of aborting the run.
+    """
+    try:
+        for _, elem in iterparse(io.BytesIO(body), events=("end",)):
+            if elem.tag.rpartition("}")[2] != "entry":
+                continue
+            eid = link = title = published = updated = None
+            for child in elem:
+                tag = child.tag.rpartition("}")[2]
+                if tag == "id":
+                    eid = child.text
+                elif tag == "link":
+                    link = child.get("href") or child.text
+                elif tag == "title":
+                    title = child.text
+                elif tag == "published":
+                    published = child.text
+                elif tag == "updated":
+                    updated = child.text
+            elem.clear()
+            yield {"id": eid, "link": link, "title": title, "ts": parse_ts(published or updated)}
+    except ParseError:
+        return
+
+
+def hours_ago(ts: float, now_ts: float | None = None) -> int:
+    # callers in hot loops pass now_ts once instead of re-reading the clock
+    if now_ts is None:
+        now_ts = time.time()
+    return max(0, int((now_ts - ts) // 3600))
+
+
+# (display name, feeds_catalog key); the queries themselves live in
+# feeds_catalog.py, shared with the workflow variant
+_FEED_KEYS = [
+    ("Findom general", "findom_general"),
+    ("Paypig", "paypig"),
+    ("Beginner findomme", "beginner_findomme"),
+    ("Platforms", "platforms"),
+    ("Telegram", "telegram"),
+    ("Findom stories", "findom_stories"),
+    ("Findom forum", "findom_forum"),
+]
+
+# URLs quoted once at import; the list never changes within a process
+_FEEDS: tuple[tuple[str, str], ...] = tuple(
+    (name, feeds_catalog.feed_url(feeds_catalog.QUERIES[key][1]))
+    for name, key in _FEED_KEYS
+)
 
 
 def build_feeds() -> list[tuple[str, str]]:
-    queries = [
-        ("Findom general", 'findom OR "financial domination"'),
-        ("Paypig", 'paypig OR "pay pig"'),
-        ("Beginner findomme", '"beginner findomme" OR "new findomme" OR "starting findom"'),
-        ("Platforms", '"findom platform" OR loyalfans OR fansly OR onlyfans'),
-        ("Telegram", 'findom telegram OR "findom telegram group"'),
-        ("Findom stories", '"findom stories" OR "paypig stories"'),
-        ("Findom forum", '"findom forum" OR "financial domination forum"'),
-    ]
-
-    feeds: list[tuple[str, str]] = []
-    for name, q in queries:
-        encoded_q = quote_plus(q)
-        url = f"https://www.reddit.com/search.rss?q={encoded_q}&sort=new&t=week"
-        feeds.append((name, url))
-    return feeds
+    return list(_FEEDS)
 
 
 def classify(feed_name: str, title: str) -> tuple[str, list[str]]:
     """Classify into one of: FINDOMME, PAYPIG, GENERAL.
 
+    feed_name and title must already be lowercased by the caller, so the
+    per-entry loop lowercases each string exactly once.
+
     Returns: (kind, reasons)
     """
-    f = (feed_name or "").lower()
-    t = (title or "").lower()
+    f = feed_name or ""
+    t = title or ""
     reasons: list[str] = []
 
     # FINDOMME
@@ -172,24 +370,97 @@ CATEGORY_SCORING: dict[str, dict] = {
 }
 
 
+def _compile_term_scan(terms: list[tuple[str, int, str]]):
+    """Build a single-pass scanner so each title is scanned once in C,
+    instead of one Python-level substring check per term.
+
+    Prefers a pyahocorasick automaton (linear in the title regardless of
+    term count); falls back to one compiled regex alternation.
+    """
+    table = {term: (pts, label) for term, pts, label in terms}
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for term, (pts, label) in table.items():
+            automaton.add_word(term, (term, pts, label))
+        automaton.make_automaton()
+        return automaton, None
+    # longest-first so e.g. "weekly thread" is not shadowed by a shorter overlap
+    pattern = "|".join(re.escape(t) for t in sorted(table, key=len, reverse=True))
+    return re.compile(pattern), table
+
+
+def _scan_terms(scan, t: str, score: int, reasons: list[str]) -> int:
+    scanner, table = scan
+    matched: set[str] = set()
+    if table is None:
+        hits = (payload for _, payload in scanner.iter(t))
+    else:
+        hits = ((m.group(0), *table[m.group(0)]) for m in scanner.finditer(t))
+    for term, pts, label in hits:
+        if term not in matched:
+            matched.add(term)
+            score += pts
+            reasons.append(label)
+    return score
+
+
+for _rules in CATEGORY_SCORING.values():
+    _rules["bonus_scan"] = _compile_term_scan(_rules["bonus_terms"])
+    _rules["penalty_scan"] = _compile_term_scan(_rules["penalty_terms"])
+
+
+# single-word vocabulary drawn from the bonus terms; the per-run TF-IDF
+# pass below is restricted to it so priorities stay small and interpretable
+_TOKEN_RE = re.compile(r"[a-z]+")
+_TFIDF_VOCAB = frozenset(
+    tok
+    for _r in CATEGORY_SCORING.values()
+    for _term, _, _ in _r["bonus_terms"]
+    for tok in _TOKEN_RE.findall(_term)
+)
+
+
+def add_priority(items: list[dict]) -> None:
+    """Attach a per-run TF-IDF priority to each collected item.
+
+    The keyword points treat every hot term as equal weight; weighting
+    term frequency by inverse document frequency over this run's titles
+    lets rare high-signal terms outrank ubiquitous ones when breaking
+    score ties for the top email slots.
+    """
+    if not items:
+        return
+    token_counts: list[Counter] = []
+    df: Counter = Counter()
+    for it in items:
+        toks = Counter(tok for tok in _TOKEN_RE.findall(it["title"].lower()) if tok in _TFIDF_VOCAB)
+        token_counts.append(toks)
+        df.update(toks.keys())
+    n = len(items)
+    idf = {tok: math.log((n + 1) / (c + 1)) + 1 for tok, c in df.items()}
+    for it, toks in zip(items, token_counts):
+        pr = sum(tf * idf[tok] for tok, tf in toks.items())
+        if "?" in it["title"]:
+            pr += 2
+        it["priority"] = round(pr, 3)
+
+
 def compute_score(kind: str, feed_name: str, title: str, age_h: int) -> tuple[int, list[str]]:
-    t = (title or "").lower()
-    f = (feed_name or "").lower()
+    # feed_name and title arrive pre-lowercased from the caller
+    t = title or ""
+    f = feed_name or ""
     score = 0
     reasons: list[str] = []
 
     # question bonus
-    if "?" in (title or ""):
+    if "?" in t:
         score += 4
         reasons.append("question")
 
     rules = CATEGORY_SCORING.get(kind) or CATEGORY_SCORING["GENERAL"]
 
     # category bonuses
-    for term, pts, label in rules.get("bonus_terms", []):
-        if term in t:
-            score += pts
-            reasons.append(label)
+    score = _scan_terms(rules["bonus_scan"], t, score, reasons)
 
     # feed relevance (category specific)
     target_feeds = [x.lower() for x in rules.get("target_feeds", [])]
@@ -198,10 +469,7 @@ def compute_score(kind: str, feed_name: str, title: str, age_h: int) -> tuple[in
         reasons.append("target-feed")
 
     # category penalties
-    for term, pts, label in rules.get("penalty_terms", []):
-        if term in t:
-            score += pts
-            reasons.append(label)
+    score = _scan_terms(rules["penalty_scan"], t, score, reasons)
 
     # age penalty
     if age_h <= 2:
@@ -220,7 +488,8 @@ def compute_score(kind: str, feed_name: str, title: str, age_h: int) -> tuple[in
 
 
 def suggested_opening(kind: str, title: str) -> str:
-    t = (title or "").lower()
+    # title arrives pre-lowercased from the caller
+    t = title or ""
 
     if kind == "FINDOMME":
         if "platform" in t or "loyalfans" in t or "onlyfans" in t or "fansly" in t:
@@ -239,294 +508,87 @@ def suggested_opening(kind: str, title: str) -> str:
     return "If you are new to this, focus on understanding the dynamics first, the rest becomes much clearer after that."
 
 
-def send_email(subject: str, body_text: str, body_html: str) -> None:
-    host = os.getenv("SMTP_HOST")
-    port = int(os.getenv("SMTP_PORT", "587"))
-    user = os.getenv("SMTP_USER")
-    pwd = os.getenv("SMTP_PASS")
-    mail_to = os.getenv("MAIL_TO")
-    mail_from = os.getenv("MAIL_FROM", user)
-
-    if not all([host, user, pwd, mail_to, mail_from]):
-        raise RuntimeError("Missing SMTP env vars")
-
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = mail_from
-    msg["To"] = mail_to
-
-    msg.attach(MIMEText(body_text, "plain", "utf-8"))
-    msg.attach(MIMEText(body_html, "html", "utf-8"))
-
-    with smtplib.SMTP(host, port) as s:
-        s.starttls()
-        s.login(user, pwd)
-        s.sendmail(mail_from, [mail_to], msg.as_string())
-
-
-def run():
-    state = load_state()
-    seen = set(state.get("seen_ids", []))
-
-    last_run_ts = float(state.get("last_run_utc_ts") or 0)
-    backfill_hours = int(os.getenv("BACKFILL_HOURS", "168"))
-    min_ts = max(last_run_ts, (utc_now() - timedelta(hours=backfill_hours)).timestamp())
-
-    max_items = int(os.getenv("MAX_ITEMS_PER_RUN", "120"))
-
-    collected: list[dict] = []
-    feeds = build_feeds()
-
-    for feed_name, feed_url in feeds:
-        d = feedparser.parse(feed_url)
-        for entry in d.entries[:200]:
-            eid = getattr(entry, "id", None) or getattr(entry, "link", None)
-            if not eid or eid in seen:
-                continue
-
-            created_ts = parse_entry_time(entry)
-            if created_ts < min_ts:
-                continue
-
-            title = (getattr(entry, "title", "") or "").strip()
-            link = (getattr(entry, "link", "") or "").strip()
-            if not title or not link:
-                continue
-
-            age_h = hours_ago(created_ts)
-            kind, kind_reasons = classify(feed_name, title)
-            score, score_reasons = compute_score(kind, feed_name, title, age_h)
-
-            # category threshold gate (fewer items, higher precision)
-            threshold = int((CATEGORY_SCORING.get(kind) or CATEGORY_SCORING["GENERAL"]).get("threshold", 10))
-            if score < threshold:
-                continue
-
-            opening = suggested_opening(kind, title)
-
-            why = {
-                "kind": kind_reasons,
-                "score": score_reasons,
-                "threshold": threshold,
-            }
-
-            item = {
-                "id": eid,
-                "created_utc": created_ts,
-                "created_iso": iso(created_ts),
-                "age_hours": age_h,
-                "feed": feed_name,
-                "kind": kind,
-                "title": title,
-                "url": link,
-                "score": score,
-                "signals": score_reasons,
-                "why": why,
-                "opening": opening,
-            }
-            collected.append(item)
-            seen.add(eid)
-
-            if len(collected) >= max_items:
-                break
-        if len(collected) >= max_items:
-            break
-
-    collected.sort(key=lambda x: (x["score"], -x["age_hours"]), reverse=True)
-
-    run_stamp = utc_now().strftime("%Y%m%d_%H%M%S")
-    out_path = OUTPUT_DIR / f"queue_{run_stamp}.json"
-    out_path.write_text(json.dumps(collected, indent=2), encoding="utf-8")
 
-    # split
-    high_priority = [x for x in collected if x["score"] >= 14 and x["age_hours"] <= 12][:10]
-    paypig = [x for x in collected if x["kind"] == "PAYPIG"][:10]
-    findomme = [x for x in collected if x["kind"] == "FINDOMME"][:10]
-    other = [x for x in collected if x["kind"] not in ["PAYPIG", "FINDOMME"]][:10]
-
-    # plain text
-    lines: list[str] = []
-    lines.append("YMS Reddit queue (manual actions)")
-    lines.append("")
-    lines.append("Routine: pick 3 threads, reply with value, usually no links in the comment.")
-    lines.append("")
-    lines.append(f"Items collected: {len(collected)}")
-    lines.append(f"Saved: {out_path}")
-    lines.append("")
-
-    def add_block(name: str, items: list[dict]):
-        lines.append(name)
-        lines.append("-" * len(name))
-        if not items:
-            lines.append("None")
-            lines.append("")
-            return
-        for i, it in enumerate(items, start=1):
-            why = it.get("why") or {}
-            kind_why = ", ".join(why.get("kind", []) or [])
-            score_why = ", ".join(why.get("score", []) or [])
-            thr = why.get("threshold", "?")
-            lines.append(
-                f"{i}. [{it['kind']}] score {it['score']} (thr {thr}) age {it['age_hours']}h"
-            )
-            lines.append(f"   Why kind: {kind_why or '-'}")
-            lines.append(f"   Why score: {score_why or '-'}")
-            lines.append(f"   {it['title']}")
-            lines.append(f"   {it['url']}")
-            lines.append(f"   Opening: {it['opening']}")
-            lines.append("")
-        lines.append("")
-
-    add_block("HIGH PRIORITY (do these first)", high_priority)
-    add_block("PAYPIG LEADS", paypig)
-    add_block("FINDOMME LEADS", findomme)
-    add_block("OTHER", other)
-
-    subject = f"YMS Reddit leads: {len(collected)} new items"
-    body_text = "\n".join(lines)
-
-    # HTML helpers
-    def esc(s: str) -> str:
-        return (s or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-    def badge(kind: str) -> str:
-        if kind == "PAYPIG":
-            return '<span class="b b-paypig">PAYPIG</span>'
-        if kind == "FINDOMME":
-            return '<span class="b b-findomme">FINDOMME</span>'
-        return '<span class="b b-general">GENERAL</span>'
-
-    def render_table(items: list[dict]) -> str:
-        if not items:
-            return '<div class="empty">No items.</div>'
-
-        rows = []
-        for i, it in enumerate(items, start=1):
-            why = it.get("why") or {}
-            kind_why = ", ".join(why.get("kind", []) or [])
-            score_why = ", ".join(why.get("score", []) or [])
-            thr = why.get("threshold", "?")
-            rows.append(
-                f"""
-                <tr>
-                  <td class="num">{i}</td>
-                  <td class="meta">
-                    {badge(it.get("kind","GENERAL"))}
-                    <div class="feed">{esc(it.get("feed",""))}</div>
-                    <div class="mini">score {it.get("score",0)} (thr {thr}) · {it.get("age_hours",0)}h</div>
-                    <div class="mini"><b>Why kind:</b> {esc(kind_why or "-")}</div>
-                    <div class="mini"><b>Why score:</b> {esc(score_why or "-")}</div>
-                  </td>
-                  <td class="title">
-                    <div class="t">{esc(it.get("title",""))}</div>
-                    <div class="opening"><b>Opening:</b> {esc(it.get("opening",""))}</div>
-                  </td>
-                  <td class="cta">
-                    <a class="btn" href="{it.get("url","")}">Open</a>
-                  </td>
-                </tr>
-                """
-            )
-
-        return f"""
-        <table>
-          <thead>
-            <tr>
-              <th>#</th>
-              <th>Type</th>
-              <th>Thread</th>
-              <th></th>
-            </tr>
-          </thead>
-          <tbody>
-            {''.join(rows)}
-          </tbody>
-        </table>
-        """
-
-    body_html = f"""
-<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1">
-  <style>
-    body {{
+# Email HTML scaffolding, built once at import. The CSS block alone is a
+# few KB; keeping it a plain constant means run() no longer re-formats it,
+# and string.Template avoids having to {{-escape every CSS brace.
+_CSS = """
+    body {
       font-family: Arial, Helvetica, sans-serif;
       background: #f6f7f9;
       margin: 0;
       padding: 24px;
       color: #111;
-    }}
-    .card {{
+    }
+    .card {
       max-width: 980px;
       margin: 0 auto;
       background: #fff;
       border-radius: 12px;
       padding: 20px;
       border: 1px solid #e6e8ee;
-    }}
-    h1 {{
+    }
+    h1 {
       font-size: 18px;
       margin: 0 0 8px 0;
-    }}
-    .sub {{
+    }
+    .sub {
       font-size: 13px;
       color: #444;
       margin-bottom: 14px;
       line-height: 1.4;
-    }}
-    .kpis {{
+    }
+    .kpis {
       font-size: 13px;
       margin: 10px 0 16px 0;
       color: #222;
       line-height: 1.5;
-    }}
-    h2 {{
+    }
+    h2 {
       font-size: 14px;
       margin: 18px 0 8px 0;
-    }}
-    table {{
+    }
+    table {
       width: 100%;
       border-collapse: collapse;
       font-size: 13px;
-    }}
-    th, td {{
+    }
+    th, td {
       border-top: 1px solid #eef0f4;
       padding: 10px 8px;
       vertical-align: top;
-    }}
-    th {{
+    }
+    th {
       text-align: left;
       color: #333;
       font-weight: 700;
       background: #fafbfc;
       border-top: 1px solid #e6e8ee;
-    }}
-    .num {{
+    }
+    .num {
       width: 36px;
       color: #666;
-    }}
-    .meta {{
+    }
+    .meta {
       width: 220px;
-    }}
-    .feed {{
+    }
+    .feed {
       font-weight: 700;
       margin-top: 6px;
-    }}
-    .mini {{
+    }
+    .mini {
       color: #666;
       margin-top: 2px;
       font-size: 12px;
       line-height: 1.35;
-    }}
-    .title {{
+    }
+    .title {
       line-height: 1.35;
-    }}
-    .t {{
+    }
+    .t {
       margin-bottom: 6px;
-    }}
-    .opening {{
+    }
+    .opening {
       color: #333;
       font-size: 12px;
       background: #fafbfc;
@@ -534,12 +596,12 @@ def run():
       border-radius: 10px;
       padding: 8px 10px;
       line-height: 1.35;
-    }}
-    .cta {{
+    }
+    .cta {
       width: 90px;
       text-align: right;
-    }}
-    .btn {{
+    }
+    .btn {
       display: inline-block;
       padding: 8px 12px;
       border-radius: 10px;
@@ -548,20 +610,20 @@ def run():
       font-weight: 700;
       color: #111;
       background: #fff;
-    }}
-    .b {{
+    }
+    .b {
       display: inline-block;
       font-size: 11px;
       padding: 3px 8px;
       border-radius: 999px;
       border: 1px solid #d6dbe6;
       font-weight: 700;
-    }}
-    .b-paypig {{ background: #fff7ed; border-color: #fed7aa; }}
-    .b-findomme {{ background: #eef2ff; border-color: #c7d2fe; }}
-    .b-media {{ background: #f0fdf4; border-color: #bbf7d0; }}
-    .b-general {{ background: #f8fafc; border-color: #e2e8f0; }}
-    .rule {{
+    }
+    .b-paypig { background: #fff7ed; border-color: #fed7aa; }
+    .b-findomme { background: #eef2ff; border-color: #c7d2fe; }
+    .b-media { background: #f0fdf4; border-color: #bbf7d0; }
+    .b-general { background: #f8fafc; border-color: #e2e8f0; }
+    .rule {
       margin-top: 12px;
       padding: 10px 12px;
       background: #fafbfc;
@@ -570,13 +632,21 @@ def run():
       font-size: 12px;
       color: #333;
       line-height: 1.4;
-    }}
-    .empty {{
+    }
+    .empty {
       font-size: 13px;
       color: #555;
       padding: 10px 0;
-    }}
-  </style>
+    }
+"""
+
+_HTML_TMPL = Template("""
+<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>""" + _CSS + """</style>
 </head>
 <body>
   <div class="card">
@@ -584,7 +654,7 @@ def run():
     <div class="sub">Pick 3 threads, reply with value, usually no links in the comment. Your profile and pinned posts do the linking.</div>
 
     <div class="kpis">
-      <b>Items collected:</b> {len(collected)}<br>
+      <b>Items collected:</b> $n_collected<br>
       <b>Saved file:</b> queue JSON committed in the repo output folder
     </div>
 
@@ -593,24 +663,304 @@ def run():
     </div>
 
     <h2>HIGH PRIORITY</h2>
-    {render_table(high_priority)}
+    $high_priority
 
     <h2>PAYPIG LEADS</h2>
-    {render_table(paypig)}
+    $paypig
 
     <h2>FINDOMME LEADS</h2>
-    {render_table(findomme)}
+    $findomme
 
     <h2>OTHER</h2>
-    {render_table(other)}
+    $other
   </div>
 </body>
 </html>
-"""
+""")
 
-    send_email(subject, body_text, body_html)
+_ROW_TMPL = Template("""
+                <tr>
+                  <td class="num">$i</td>
+                  <td class="meta">
+                    $badge
+                    <div class="feed">$feed</div>
+                    <div class="mini">score $score (thr $thr) · ${age_hours}h</div>
+                    <div class="mini"><b>Why kind:</b> $kind_why</div>
+                    <div class="mini"><b>Why score:</b> $score_why</div>
+                  </td>
+                  <td class="title">
+                    <div class="t">$title</div>
+                    <div class="opening"><b>Opening:</b> $opening</div>
+                  </td>
+                  <td class="cta">
+                    <a class="btn" href="$url">Open</a>
+                  </td>
+                </tr>
+""")
+
+
+def badge(kind: str) -> str:
+    if kind == "PAYPIG":
+        return '<span class="b b-paypig">PAYPIG</span>'
+    if kind == "FINDOMME":
+        return '<span class="b b-findomme">FINDOMME</span>'
+    return '<span class="b b-general">GENERAL</span>'
+
+
+def render_table(items: list[dict]) -> str:
+    if not items:
+        return '<div class="empty">No items.</div>'
+
+    def row(i: int, it: dict) -> str:
+        why = it.get("why") or {}
+        kind_why = ", ".join(why.get("kind", []) or [])
+        score_why = ", ".join(why.get("score", []) or [])
+        return _ROW_TMPL.substitute(
+            i=i,
+            badge=badge(it.get("kind", "GENERAL")),
+            feed=esc(it.get("feed", "")),
+            score=it.get("score", 0),
+            thr=why.get("threshold", "?"),
+            age_hours=it.get("age_hours", 0),
+            kind_why=esc(kind_why or "-"),
+            score_why=esc(score_why or "-"),
+            title=esc(it.get("title", "")),
+            opening=esc(it.get("opening", "")),
+            # quote=True (the default) so a stray '"' in a link can't
+            # break out of the href attribute
+            url=esc(it.get("url", "")),
+        )
+
+    rows = "".join(row(i, it) for i, it in enumerate(items, start=1))
+
+    return f"""
+        <table>
+          <thead>
+            <tr>
+              <th>#</th>
+              <th>Type</th>
+              <th>Thread</th>
+              <th></th>
+            </tr>
+          </thead>
+          <tbody>
+            {rows}
+          </tbody>
+        </table>
+        """
+
+
+class SmtpSession:
+    """One SMTP connection per run.
+
+    connect + starttls + login cost ~5 RTTs, so pay them once and let
+    send() be called any number of times (e.g. per-bucket digests later).
+    """
+
+    def __enter__(self) -> "SmtpSession":
+        host = os.getenv("SMTP_HOST")
+        port = int(os.getenv("SMTP_PORT", "587"))
+        user = os.getenv("SMTP_USER")
+        pwd = os.getenv("SMTP_PASS")
+        # MAIL_TO may be a comma-separated list; split once, send once
+        self.mail_to = [a.strip() for a in (os.getenv("MAIL_TO") or "").split(",") if a.strip()]
+        self.mail_from = os.getenv("MAIL_FROM", user)
+
+        if not all([host, user, pwd, self.mail_to, self.mail_from]):
+            raise RuntimeError("Missing SMTP env vars")
+
+        self.server = smtplib.SMTP(host, port)
+        self.server.starttls()
+        self.server.login(user, pwd)
+        return self
+
+    def send(self, subject: str, body_text: str, body_html: str) -> None:
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = self.mail_from
+        msg["To"] = ", ".join(self.mail_to)
+
+        msg.attach(MIMEText(body_text, "plain", "utf-8"))
+        msg.attach(MIMEText(body_html, "html", "utf-8"))
+
+        # send_message serializes straight to bytes (no str round-trip)
+        # and the DATA phase goes out once for all recipients
+        self.server.send_message(msg, self.mail_from, self.mail_to)
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.server.quit()
+        except smtplib.SMTPException:
+            pass
+
+
+def run():
+    state = load_state()
+    # two dedup layers: a small precise window of the most recent keys
+    # (deque + set) and a Bloom filter holding the long tail at constant
+    # size. Pre-migration state holds raw ids that can't be mapped to
+    # canon_key digests, so the filter starts empty on first migration
+    # and min_ts bounds any re-collection.
+    seen_bloom = BloomFilter.load(state.get("seen_bloom"))
+    seen_order: deque[str] = deque(state.get("seen_ids", []), maxlen=500)
+    seen = set(seen_order)
+
+    now_ts = time.time()
+    last_run_ts = float(state.get("last_run_utc_ts") or 0)
+    backfill_hours = int(os.getenv("BACKFILL_HOURS", "168"))
+    min_ts = max(last_run_ts, now_ts - backfill_hours * 3600)
 
-    state["seen_ids"] = list(seen)[-10000:]
+    max_items = int(os.getenv("MAX_ITEMS_PER_RUN", "120"))
+
+    collected: list[dict] = []
+    feeds = build_feeds()
+    feed_cache = state.get("feed_cache") or {}
+    bodies = fetch_feed_bodies([url for _, url in feeds], feed_cache)
+
+    # per-feed cap: roughly each feed's share of max_items with 2x headroom,
+    # so no single feed can eat the whole budget before the others are read
+    per_feed_cap = max(12, 2 * (max_items // max(1, len(feeds))))
+
+    for (feed_name, feed_url), body in zip(feeds, bodies):
+        if body is None:
+            continue
+        for entry in islice(stream_entries(body), per_feed_cap):
+            eid = entry["id"] or entry["link"]
+            if not eid:
+                continue
+            key = canon_key(eid, entry["link"] or "")
+            if key in seen or key in seen_bloom:
+                continue
+
+            created_ts = entry["ts"]
+            if created_ts < min_ts:
+                # search.rss is sorted newest-first (sort=new), so every
+                # entry after this one is older still
+                break
+
+            title = (entry["title"] or "").strip()
+            link = (entry["link"] or "").strip()
+            if not title or not link:
+                continue
+
+            age_h = hours_ago(created_ts, now_ts)
+            t_lower = title.lower()
+            f_lower = feed_name.lower()
+            kind, kind_reasons = classify(f_lower, t_lower)
+            score, score_reasons = compute_score(kind, f_lower, t_lower, age_h)
+
+            # category threshold gate (fewer items, higher precision)
+            threshold = int((CATEGORY_SCORING.get(kind) or CATEGORY_SCORING["GENERAL"]).get("threshold", 10))
+            if score < threshold:
+                continue
+
+            opening = suggested_opening(kind, t_lower)
+
+            why = {
+                "kind": kind_reasons,
+                "score": score_reasons,
+                "threshold": threshold,
+            }
+
+            item = {
+                "id": eid,
+                "created_utc": created_ts,
+                "created_iso": iso(created_ts),
+                "age_hours": age_h,
+                "feed": feed_name,
+                "kind": kind,
+                "title": title,
+                "url": link,
+                "score": score,
+                "signals": score_reasons,
+                "why": why,
+                "opening": opening,
+            }
+            collected.append(item)
+            seen.add(key)
+            seen_order.append(key)
+            seen_bloom.add(key)
+
+            if len(collected) >= max_items:
+                break
+        if len(collected) >= max_items:
+            break
+
+    add_priority(collected)
+    collected.sort(key=lambda x: (x["score"], x["priority"], -x["age_hours"]), reverse=True)
+
+    now_dt = utc_now()
+    # daily NDJSON rollup, append-only: serialization stays O(new items)
+    # per run and readers can stream it line by line
+    out_path = OUTPUT_DIR / f"queue_{now_dt.strftime('%Y%m%d')}.ndjson"
+    with out_path.open("ab") as fp:
+        for it in collected:
+            fp.write(dumps_bytes(it) + b"\n")
+
+    # opt-in full per-run snapshot in the old format
+    if os.getenv("FULL_SNAPSHOT"):
+        snap_path = OUTPUT_DIR / f"queue_{now_dt.strftime('%Y%m%d_%H%M%S')}.json"
+        if os.getenv("DEBUG_JSON"):
+            with snap_path.open("w", encoding="utf-8") as fp:
+                json.dump(collected, fp, indent=2)
+        else:
+            snap_path.write_bytes(dumps_bytes(collected))
+
+    # split
+    high_priority = [x for x in collected if x["score"] >= 14 and x["age_hours"] <= 12][:10]
+    paypig = [x for x in collected if x["kind"] == "PAYPIG"][:10]
+    findomme = [x for x in collected if x["kind"] == "FINDOMME"][:10]
+    other = [x for x in collected if x["kind"] not in ["PAYPIG", "FINDOMME"]][:10]
+
+    # plain text; written into one growable buffer instead of a list + join
+    buf = io.StringIO()
+    w = buf.write
+    w("YMS Reddit queue (manual actions)\n\n")
+    w("Routine: pick 3 threads, reply with value, usually no links in the comment.\n\n")
+    w(f"Items collected: {len(collected)}\n")
+    w(f"Saved: {out_path}\n\n")
+
+    def add_block(name: str, items: list[dict]):
+        w(f"{name}\n")
+        w("-" * len(name) + "\n")
+        if not items:
+            w("None\n\n")
+            return
+        for i, it in enumerate(items, start=1):
+            why = it.get("why") or {}
+            kind_why = ", ".join(why.get("kind", []) or [])
+            score_why = ", ".join(why.get("score", []) or [])
+            thr = why.get("threshold", "?")
+            w(f"{i}. [{it['kind']}] score {it['score']} (thr {thr}) age {it['age_hours']}h\n")
+            w(f"   Why kind: {kind_why or '-'}\n")
+            w(f"   Why score: {score_why or '-'}\n")
+            w(f"   {it['title']}\n")
+            w(f"   {it['url']}\n")
+            w(f"   Opening: {it['opening']}\n\n")
+        w("\n")
+
+    add_block("HIGH PRIORITY (do these first)", high_priority)
+    add_block("PAYPIG LEADS", paypig)
+    add_block("FINDOMME LEADS", findomme)
+    add_block("OTHER", other)
+
+    subject = f"YMS Reddit leads: {len(collected)} new items"
+    body_text = buf.getvalue()
+
+    body_html = _HTML_TMPL.substitute(
+        n_collected=len(collected),
+        high_priority=render_table(high_priority),
+        paypig=render_table(paypig),
+        findomme=render_table(findomme),
+        other=render_table(other),
+    )
+
+    with SmtpSession() as smtp:
+        smtp.send(subject, body_text, body_html)
+
+    state["seen_ids"] = list(seen_order)
+    state["seen_bloom"] = seen_bloom.dump()
+    state["feed_cache"] = feed_cache
     state["last_run_utc_ts"] = time.time()
     save_state(state)
 
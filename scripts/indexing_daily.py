@@ -8,9 +8,15 @@ from typing import List, Dict, Any
 import requests
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
 
 SCOPES = ["https://www.googleapis.com/auth/indexing"]
 
+# one keep-alive session for the WP fetch and the per-URL indexing
+# submits: the TLS handshake happens once per host instead of per call
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 
 def get_access_token() -> str:
     raw = os.environ.get("GSC_SERVICE_ACCOUNT_JSON")
@@ -29,7 +35,7 @@ def submit_url(url: str, token: str) -> Dict[str, Any]:
     endpoint = "https://indexing.googleapis.com/v3/urlNotifications:publish"
     payload = {"url": url, "type": "URL_UPDATED"}
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    r = requests.post(endpoint, headers=headers, json=payload, timeout=60)
+    r = _session.post(endpoint, headers=headers, json=payload, timeout=60)
     if not r.ok:
         raise RuntimeError(f"Indexing API HTTP {r.status_code}: {r.text[:2000]}")
     return r.json()
@@ -58,7 +64,7 @@ def fetch_published_posts_last_24h(base_url: str, headers: dict) -> List[Dict[st
         "_fields": "id,link,date_gmt",
     }
 
-    r = requests.get(url, headers=headers, params=params, timeout=60)
+    r = _session.get(url, headers=headers, params=params, timeout=60)
     r.raise_for_status()
     return r.json()
 
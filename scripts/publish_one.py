@@ -1,88 +1,194 @@
 import base64
 import csv
+import hashlib
 import json
 import os
 import re
+import sqlite3
+import string
 import sys
+import time
+import unicodedata
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import requests
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # C serializer; both directions are several times faster than stdlib
+    # on the multi-KB OpenAI payloads and responses
+    import orjson
+except ImportError:
+    orjson = None
 
 ROOT = Path(__file__).resolve().parents[1]
 KEYWORDS_CSV = ROOT / "data" / "keywords.csv"
 PROMPT_FILE = ROOT / "prompts" / "template_v1.txt"
 CONFIG_FILE = ROOT / "config.json"
 LINKS_FILE = ROOT / "internal_links.json"
+CACHE_DB = ROOT / ".cache" / "drafts.sqlite"
 
 AUTO_SCHEDULE = os.getenv("AUTO_SCHEDULE", "false").lower() == "true"
 SCHEDULE_HOUR_UTC = int(os.getenv("SCHEDULE_HOUR_UTC", "7"))
 
-
+# fold the humanize instructions into the generation prompt and skip the
+# second LLM round-trip entirely; humanize_text stays as the default path
+HUMANIZE_INLINE = os.getenv("OPENAI_HUMANIZE_INLINE") == "1"
+
+_HUMANIZE_INLINE_SUFFIX = (
+    "\n\nStyle requirements for content_html:\n"
+    "Sound naturally human.\n"
+    "Vary sentence rhythm.\n"
+    "Reduce predictability.\n"
+    "Avoid em dashes.\n"
+)
+
+# shared worker pool for side work that can overlap the critical path
+# (the humanize rewrite, the notification email)
+_executor = ThreadPoolExecutor(max_workers=2)
+
+# one keep-alive session shared by the OpenAI and WordPress calls: the TLS
+# handshake happens once per host, and transient 429/5xx on reads get
+# retried with backoff instead of failing the run. POSTs are deliberately
+# excluded here — openai_call does its own Retry-After-aware retry, and
+# blindly replaying a WP create could double-post
+_session = requests.Session()
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        ),
+    ),
+)
+
+
+def loads(raw) -> dict:
+    # accepts str or bytes; orjson when available, stdlib otherwise
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+# cached: these are read once per process, which matters in batch mode
+# where every row would otherwise re-read and re-parse the same files
+@lru_cache(maxsize=1)
 def load_config() -> dict:
-    return json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
+    return loads(CONFIG_FILE.read_bytes())
 
 
+@lru_cache(maxsize=1)
 def load_links() -> dict:
-    return json.loads(LINKS_FILE.read_text(encoding="utf-8"))
+    return loads(LINKS_FILE.read_bytes())
 
 
-def slugify(text: str) -> str:
-    text = (text or "").strip().lower()
-    text = re.sub(r"[^a-z0-9\s-]", "", text)
-    text = re.sub(r"\s+", "-", text)
-    text = re.sub(r"-{2,}", "-", text)
-    return text.strip("-")[:80] or "draft"
+@lru_cache(maxsize=1)
+def prompt_template_text() -> str:
+    return PROMPT_FILE.read_text(encoding="utf-8")
 
 
-def read_first_todo_row() -> tuple[int, dict, list[dict]]:
-    rows: list[dict] = []
-    with KEYWORDS_CSV.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            rows.append(r)
+# one C-level table pass instead of per-char regex classification: after
+# the NFKD/ascii fold the text is pure ASCII, so the table can map
+# whitespace to "-", keep [a-z0-9-] and delete everything else
+_SLUG_TABLE: dict[int, str | None] = {i: None for i in range(128)}
+_SLUG_TABLE.update({ord(c): c for c in string.ascii_lowercase + string.digits + "-"})
+_SLUG_TABLE.update({ord(c): "-" for c in string.whitespace})
+_RE_DASHES = re.compile(r"-{2,}")
 
-    for idx, r in enumerate(rows):
-        if (r.get("status") or "").strip().lower() == "todo":
-            return idx, r, rows
 
-    return -1, {}, rows
+def slugify(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii")
+    text = text.strip().lower().translate(_SLUG_TABLE)
+    return _RE_DASHES.sub("-", text).strip("-")[:80] or "draft"
 
 
-def write_rows(rows: list[dict], fieldnames: list[str]) -> None:
-    with KEYWORDS_CSV.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+def read_rows() -> list[dict]:
+    with KEYWORDS_CSV.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def update_rows_streaming(predicate, updater) -> int:
+    """Stream keywords.csv into a temp file, applying updater to rows
+    where predicate(index, row) is true, then swap atomically.
+
+    Memory stays bounded to one row and a crash mid-write can never
+    leave a truncated CSV, so each draft can checkpoint its outcome as
+    soon as it is known. Returns the number of rows updated.
+    """
+    tmp = KEYWORDS_CSV.with_suffix(".csv.tmp")
+    updated = 0
+    # 1 MB buffers and a plain csv.writer fed tuples: untouched rows are
+    # copied without DictWriter's per-row fieldname dict handling
+    with KEYWORDS_CSV.open("r", encoding="utf-8", newline="", buffering=1 << 20) as src, \
+            tmp.open("w", encoding="utf-8", newline="", buffering=1 << 20) as dst:
+        reader = csv.DictReader(src)
+        fieldnames = ensure_csv_fields(reader.fieldnames or [])
+        writer = csv.writer(dst)
+        writer.writerow(fieldnames)
+        for i, row in enumerate(reader):
+            if predicate(i, row):
+                for col in fieldnames:
+                    row.setdefault(col, "")
+                updater(row)
+                updated += 1
+            writer.writerow(tuple(row.get(fn, "") for fn in fieldnames))
+    os.replace(tmp, KEYWORDS_CSV)
+    return updated
+
+
+def mark_row(idx: int, **fields) -> None:
+    update_rows_streaming(lambda i, row: i == idx, lambda row: row.update(fields))
 
 
 def extract_output_text(resp: dict) -> str:
-    parts: list[str] = []
-    for item in resp.get("output", []):
-        if item.get("type") != "message":
-            continue
-        for c in item.get("content", []):
-            ctype = c.get("type")
-            if ctype == "output_text":
-                parts.append(c.get("text", ""))
-            elif ctype == "refusal":
-                parts.append(c.get("refusal", ""))
-    return "".join(parts).strip()
+    # one join over a generator, no intermediate parts list; the ()
+    # defaults avoid allocating a fresh empty list per miss
+    return "".join(
+        c.get("text", "") if c.get("type") == "output_text" else c.get("refusal", "")
+        for item in resp.get("output", ()) if item.get("type") == "message"
+        for c in item.get("content", ()) if c.get("type") in ("output_text", "refusal")
+    ).strip()
+
+
+# compiled once; translate maps the em dash via a C-level table lookup
+_H1_RE = re.compile(r"<h1\b[^>]*>.*?</h1>", re.IGNORECASE | re.DOTALL)
+_EMDASH_TABLE = str.maketrans({"—": ", "})
 
 
-def sanitize_content_html(html: str) -> str:
-    if not html:
-        return html
+def _finalize_html(content_html: str, keyword: str) -> str:
+    """Fused post-processing for generated HTML.
 
-    # remove any accidental H1 to avoid double H1 in WP
-    html = re.sub(r"<h1\b[^>]*>.*?</h1>", "", html, flags=re.IGNORECASE | re.DOTALL)
+    Strips any accidental H1 (avoids double H1 in WP), injects the
+    personal block ahead of the FAQ, drops em dashes and softens
+    "However," — one function instead of a chain of full-string passes,
+    so the HTML is copied a couple of times rather than once per step.
+    """
+    if not content_html:
+        return content_html
 
-    # replace em dash if it slipped in
-    html = html.replace("—", ", ")
+    variations = [
+        f"<p><strong>My perspective:</strong> I used to misunderstand {keyword} when I first explored it. Over time I noticed that what really matters is consistency, not intensity.</p>",
+        f"<p><strong>My perspective:</strong> With {keyword}, I have seen people focus on the wrong signals. The real difference is usually subtle.</p>",
+        f"<p><strong>My perspective:</strong> Not everyone agrees on how {keyword} should work. From what I have observed, clarity beats drama every time.</p>",
+    ]
+    block = variations[hash(keyword) % len(variations)]
+
+    html = _H1_RE.sub("", content_html)
+    if "<h2>FAQ</h2>" in html:
+        html = html.replace("<h2>FAQ</h2>", block + "<h2>FAQ</h2>")
+    else:
+        html = html + "\n" + block
 
-    return html.strip()
+    return html.translate(_EMDASH_TABLE).replace("However,", "Still,").strip()
 
 
 def send_notification_email(post_id: int, title: str, cluster: str, wp_status: str, date_gmt: str | None):
@@ -122,8 +228,14 @@ YourMoneySlave SEO Bot
     msg["To"] = to_email
 
     try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
+        # port 465 is implicit TLS: SMTP_SSL skips the extra STARTTLS
+        # round-trip that the 587 path needs
+        if smtp_port == 465:
+            server = smtplib.SMTP_SSL(smtp_host, smtp_port)
+        else:
+            server = smtplib.SMTP(smtp_host, smtp_port)
             server.starttls()
+        with server:
             server.login(smtp_user, smtp_password)
             server.send_message(msg)
         print("Notification email sent successfully.")
@@ -131,19 +243,88 @@ YourMoneySlave SEO Bot
         print(f"Failed to send notification email: {e}")
 
 
+def _cache_conn() -> sqlite3.Connection:
+    CACHE_DB.parent.mkdir(exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS drafts (key TEXT PRIMARY KEY, created_at INT, payload BLOB)")
+    return conn
+
+
+def _draft_cache_key(template: str, keyword: str, links: list[str], model: str) -> str:
+    # exact-match key: same template + keyword + links + model means the
+    # same draft, so an error-recovery retry must not pay for the LLM again
+    h = hashlib.sha256()
+    for part in (template, keyword, *links, model):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _cache_get(key: str) -> dict | None:
+    try:
+        with _cache_conn() as conn:
+            row = conn.execute("SELECT created_at, payload FROM drafts WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        return None
+    if not row:
+        return None
+    ttl_hours = int(os.getenv("DRAFT_CACHE_TTL_HOURS", "0"))
+    if ttl_hours and time.time() - row[0] > ttl_hours * 3600:
+        return None
+    return loads(row[1])
+
+
+def _cache_put(key: str, obj: dict) -> None:
+    payload = orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode("utf-8")
+    try:
+        with _cache_conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO drafts (key, created_at, payload) VALUES (?, ?, ?)",
+                (key, int(time.time()), payload),
+            )
+    except sqlite3.Error:
+        # the cache is best-effort; never let it break a draft
+        pass
+
+
 def openai_call(payload: dict) -> dict:
     api_key = os.environ["OPENAI_API_KEY"]
     url = "https://api.openai.com/v1/responses"
     headers = {"Authorization": f"Bearer {api_key}"}
 
-    r = requests.post(url, headers=headers, json=payload, timeout=90)
+    if orjson is not None:
+        headers["Content-Type"] = "application/json"
+        body = {"data": orjson.dumps(payload)}
+    else:
+        body = {"json": payload}
+
+    # the adapter only retries GETs, so this POST retries here: a 429
+    # honours the server's Retry-After, a 5xx backs off exponentially,
+    # and only a persistent failure aborts the row
+    for attempt in range(4):
+        r = _session.post(url, headers=headers, timeout=90, **body)
+        if attempt < 3 and r.status_code == 429:
+            try:
+                delay = float(r.headers.get("Retry-After", "1"))
+            except ValueError:
+                delay = 1.0
+            time.sleep(min(delay, 30.0))
+            continue
+        if attempt < 3 and 500 <= r.status_code < 600:
+            time.sleep(0.5 * 2**attempt)
+            continue
+        break
+
     if not r.ok:
         raise RuntimeError(f"OpenAI HTTP {r.status_code}: {r.text[:2000]}")
-    return r.json()
+    return loads(r.content)
 
 
 def humanize_text(content_html: str) -> str:
-    model = os.environ.get("OPENAI_MODEL", "gpt-5-mini")
+    # a pure rewrite doesn't need the draft model: a cheaper one can be
+    # pinned via OPENAI_HUMANIZE_MODEL, and reasoning is dialed down to
+    # minimal since reasoning tokens dominate latency here
+    model = os.environ.get("OPENAI_HUMANIZE_MODEL") or os.environ.get("OPENAI_MODEL", "gpt-5-mini")
     max_out = int(os.environ.get("OPENAI_HUMANIZE_MAX_OUTPUT_TOKENS", "650"))
     bump_out = int(os.environ.get("OPENAI_HUMANIZE_MAX_OUTPUT_TOKENS_BUMP", "1100"))
 
@@ -164,7 +345,7 @@ def humanize_text(content_html: str) -> str:
         "input": [
             {"role": "user", "content": [{"type": "input_text", "text": prompt}]}
         ],
-        "reasoning": {"effort": "low"},
+        "reasoning": {"effort": "minimal"},
         "max_output_tokens": max_out,
         "store": False,
     }
@@ -182,54 +363,86 @@ def humanize_text(content_html: str) -> str:
     return text.strip() if text else content_html
 
 
-def inject_personal_block(content_html: str, keyword: str) -> str:
-    variations = [
-        f"<p><strong>My perspective:</strong> I used to misunderstand {keyword} when I first explored it. Over time I noticed that what really matters is consistency, not intensity.</p>",
-        f"<p><strong>My perspective:</strong> With {keyword}, I have seen people focus on the wrong signals. The real difference is usually subtle.</p>",
-        f"<p><strong>My perspective:</strong> Not everyone agrees on how {keyword} should work. From what I have observed, clarity beats drama every time.</p>",
-    ]
-
-    block = variations[hash(keyword) % len(variations)]
-
-    if "<h2>FAQ</h2>" in content_html:
-        return content_html.replace("<h2>FAQ</h2>", block + "<h2>FAQ</h2>")
-    return content_html + "\n" + block
+_DRAFT_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["title", "slug", "excerpt", "content_html", "tags", "meta_description"],
+    "properties": {
+        "title": {"type": "string", "minLength": 4, "maxLength": 120},
+        "slug": {"type": "string", "minLength": 3, "maxLength": 120},
+        "excerpt": {"type": "string", "minLength": 20, "maxLength": 220},
+        "content_html": {"type": "string", "minLength": 200, "maxLength": 8000},
+        "tags": {
+            "type": "array",
+            "minItems": 3,
+            "maxItems": 10,
+            "items": {"type": "string", "minLength": 2, "maxLength": 30},
+        },
+        "meta_description": {"type": "string", "minLength": 50, "maxLength": 160},
+    },
+}
+
+
+def _validate_draft(obj) -> None:
+    """Check the parsed draft against _DRAFT_SCHEMA.
+
+    strict=True in the request is a promise the model occasionally
+    breaks; without this a bad draft only surfaces as a KeyError after
+    the WP POST has started. One fixed schema doesn't warrant a
+    validator dependency, so the checks are unrolled by hand.
+    """
+    if not isinstance(obj, dict):
+        raise RuntimeError(f"Model output is not a JSON object: {type(obj).__name__}")
+
+    for field in _DRAFT_SCHEMA["required"]:
+        if field not in obj:
+            raise RuntimeError(f"Model output missing required field '{field}'")
+
+    for field, spec in _DRAFT_SCHEMA["properties"].items():
+        value = obj[field]
+        if spec["type"] == "string":
+            ok = isinstance(value, str) and spec["minLength"] <= len(value) <= spec["maxLength"]
+        else:
+            item = spec["items"]
+            ok = (
+                isinstance(value, list)
+                and spec["minItems"] <= len(value) <= spec["maxItems"]
+                and all(
+                    isinstance(t, str) and item["minLength"] <= len(t) <= item["maxLength"]
+                    for t in value
+                )
+            )
+        if not ok:
+            raise RuntimeError(f"Model output field '{field}' violates the draft schema")
 
 
-def openai_generate_json(keyword: str, links: list[str]) -> dict:
+def openai_generate_json(keyword: str, links: list[str], prompt_override: str | None = None) -> dict:
     model = os.environ.get("OPENAI_MODEL", "gpt-5-mini")
 
-    prompt_template = os.environ.get("PROMPT_OVERRIDE") or PROMPT_FILE.read_text(encoding="utf-8")
+    # explicit override wins over the env hook so concurrent batch rows
+    # don't have to share a mutable environment variable
+    prompt_template = prompt_override or os.environ.get("PROMPT_OVERRIDE") or prompt_template_text()
+    if HUMANIZE_INLINE:
+        # appended before the cache key is derived, so inline and
+        # two-call drafts never collide in the cache
+        prompt_template += _HUMANIZE_INLINE_SUFFIX
     prompt = prompt_template.replace("{KEYWORD}", keyword)
 
     if len(links) < 3:
         raise RuntimeError("Internal links mapping must contain at least 3 URLs")
 
+    cache_key = _draft_cache_key(prompt_template, keyword, links, model)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        print(f"Draft cache hit for keyword='{keyword}'")
+        return cached
+
     prompt = (
         prompt.replace("{INTERNAL_LINK_1}", links[0])
         .replace("{INTERNAL_LINK_2}", links[1])
         .replace("{INTERNAL_LINK_3}", links[2])
     )
 
-    schema = {
-        "type": "object",
-        "additionalProperties": False,
-        "required": ["title", "slug", "excerpt", "content_html", "tags", "meta_description"],
-        "properties": {
-            "title": {"type": "string", "minLength": 4, "maxLength": 120},
-            "slug": {"type": "string", "minLength": 3, "maxLength": 120},
-            "excerpt": {"type": "string", "minLength": 20, "maxLength": 220},
-            "content_html": {"type": "string", "minLength": 200, "maxLength": 8000},
-            "tags": {
-                "type": "array",
-                "minItems": 3,
-                "maxItems": 10,
-                "items": {"type": "string", "minLength": 2, "maxLength": 30},
-            },
-            "meta_description": {"type": "string", "minLength": 50, "maxLength": 160},
-        },
-    }
-
     payload = {
         "model": model,
         "input": [
@@ -242,7 +455,7 @@ def openai_generate_json(keyword: str, links: list[str]) -> dict:
                 "type": "json_schema",
                 "name": "wp_draft",
                 "strict": True,
-                "schema": schema,
+                "schema": _DRAFT_SCHEMA,
             }
         },
         "store": False,
@@ -264,20 +477,30 @@ def openai_generate_json(keyword: str, links: list[str]) -> dict:
         raise RuntimeError(f"OpenAI returned empty text. Response snippet: {snippet}")
 
     try:
-        obj = json.loads(text)
-    except json.JSONDecodeError as e:
+        obj = loads(text)
+    except ValueError as e:
         raise RuntimeError(f"Failed to parse JSON from model output: {e}\nRaw:\n{text[:2000]}")
 
-    # Post processing: humanize + personal block + sanitize
-    obj["content_html"] = humanize_text(obj["content_html"])
-    obj["content_html"] = inject_personal_block(obj["content_html"], keyword)
-    obj["content_html"] = sanitize_content_html(obj["content_html"])
-    obj["content_html"] = obj["content_html"].replace("However,", "Still,")
+    # fail here, before any WP/SMTP work is spent on a malformed draft
+    _validate_draft(obj)
 
+    # Post processing: humanize + personal block + sanitize. The humanize
+    # rewrite runs inline — concurrency across rows comes from the batch
+    # pool in main(), so a future here would only overlap the rewrite
+    # with a microseconds-long slugify. With HUMANIZE_INLINE the model
+    # already wrote humanized HTML and the second call is skipped.
+    if not HUMANIZE_INLINE:
+        obj["content_html"] = humanize_text(obj["content_html"])
     obj["slug"] = slugify(obj.get("slug") or obj.get("title") or keyword)
+    obj["content_html"] = _finalize_html(obj["content_html"], keyword)
+
+    _cache_put(cache_key, obj)
     return obj
 
 
+# cached: the base64 auth token and base URL are env-derived constants,
+# so batch mode shouldn't rebuild them per call
+@lru_cache(maxsize=1)
 def _wp_headers() -> tuple[str, dict]:
     base_url = os.environ["WP_BASE_URL"].rstrip("/")
     wp_user = os.environ["WP_USER"]
@@ -303,7 +526,7 @@ def wp_fetch_recent_links_by_category(base_url: str, headers: dict, category_id:
         "categories": str(int(category_id)),
         "_fields": "link",
     }
-    r = requests.get(url, headers=headers, params=params, timeout=60)
+    r = _session.get(url, headers=headers, params=params, timeout=60)
     r.raise_for_status()
     items = r.json()
     out: list[str] = []
@@ -319,7 +542,7 @@ def _iso_gmt(dt: datetime) -> str:
 
 def get_last_scheduled_post_date_gmt(base_url: str, headers: dict) -> datetime | None:
     url = f"{base_url}/wp-json/wp/v2/posts?status=future&per_page=1&orderby=date&order=desc"
-    r = requests.get(url, headers=headers, timeout=60)
+    r = _session.get(url, headers=headers, timeout=60)
     r.raise_for_status()
     items = r.json()
     if not items:
@@ -347,7 +570,7 @@ def compute_next_slot_gmt(last_scheduled_gmt: datetime | None) -> datetime:
     return candidate
 
 
-def wp_create_post(post: dict, guides_category_id: int) -> tuple[int, str, str | None]:
+def wp_create_post(post: dict, guides_category_id: int, last_gmt_fut=None) -> tuple[int, str, str | None]:
     base_url, headers = _wp_headers()
 
     payload = {
@@ -361,14 +584,20 @@ def wp_create_post(post: dict, guides_category_id: int) -> tuple[int, str, str |
 
     date_gmt_out: str | None = None
     if AUTO_SCHEDULE:
-        last_gmt = get_last_scheduled_post_date_gmt(base_url, headers)
+        # last_gmt_fut is a lookup prefetched while drafts were still
+        # generating; it is only valid for the first post of a run, so
+        # later calls query again after each created "future" post
+        if last_gmt_fut is not None:
+            last_gmt = last_gmt_fut.result()
+        else:
+            last_gmt = get_last_scheduled_post_date_gmt(base_url, headers)
         next_gmt = compute_next_slot_gmt(last_gmt)
         date_gmt_out = _iso_gmt(next_gmt)
         payload["status"] = "future"
         payload["date_gmt"] = date_gmt_out
 
     url = f"{base_url}/wp-json/wp/v2/posts"
-    r = requests.post(url, headers=headers, json=payload, timeout=90)
+    r = _session.post(url, headers=headers, json=payload, timeout=90)
     r.raise_for_status()
     created = r.json()
 
@@ -377,107 +606,127 @@ def wp_create_post(post: dict, guides_category_id: int) -> tuple[int, str, str |
     return post_id, wp_status, date_gmt_out
 
 
-def ensure_csv_fields(rows: list[dict]) -> list[str]:
+def ensure_csv_fields(fieldnames: list[str]) -> list[str]:
     # ensure the CSV keeps these columns even if older rows did not have them
     desired = ["keyword", "cluster", "status", "wp_post_id", "last_error", "created_at", "published_at"]
 
-    if not rows:
-        return desired
-
-    current = list(rows[0].keys())
+    current = list(fieldnames)
     for col in desired:
         if col not in current:
             current.append(col)
 
-    for r in rows:
-        for col in desired:
-            r.setdefault(col, "")
-
     return current
 
 
-def main() -> int:
-    if not KEYWORDS_CSV.exists():
-        print(f"Missing {KEYWORDS_CSV}. Create it first.", file=sys.stderr)
-        return 2
+def build_prompt_template(cluster: str, cfg: dict, base_url: str, headers: dict) -> str:
+    ids = cfg.get("wp_cluster_category_ids", {})
 
-    cfg = load_config()
-    guides_id = int(cfg["wp_guides_category_id"])
+    extra_links: list[str] = []
 
-    idx, row, rows = read_first_todo_row()
-    if idx < 0:
-        print("No todo keywords found. Nothing to do.")
-        return 0
+    if cluster == "paypig_entry":
+        extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_entry_for_paypigs", 0), 1)
+        extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_entry_mistresses", 0), 1)
+    elif cluster == "paypig_psychology":
+        extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_psychology_for_paypigs", 0), 2)
+    elif cluster == "domme_training":
+        extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("domme_training_for_findommes", 0), 2)
+    elif cluster == "session_dynamics":
+        extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("session_dynamics_findom_educational", 0), 2)
 
-    fieldnames = ensure_csv_fields(rows)
+    extra_links = [u for u in extra_links if u]
+    extra_links = list(dict.fromkeys(extra_links))[:2]
 
-    keyword = (row.get("keyword") or "").strip()
-    if not keyword:
-        rows[idx]["status"] = "error"
-        rows[idx]["last_error"] = "Empty keyword"
-        write_rows(rows, fieldnames)
-        return 1
+    prompt_template = prompt_template_text()
 
-    try:
-        cluster = (row.get("cluster") or "").strip().lower() or "default"
-        links_map = load_links()
-        links = links_map.get(cluster, links_map["default"])
-        base_url, headers = _wp_headers()
-        ids = cfg.get("wp_cluster_category_ids", {})
-
-        extra_links: list[str] = []
-
-        if cluster == "paypig_entry":
-            extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_entry_for_paypigs", 0), 1)
-            extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_entry_mistresses", 0), 1)
-        elif cluster == "paypig_psychology":
-            extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("paypig_psychology_for_paypigs", 0), 2)
-        elif cluster == "domme_training":
-            extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("domme_training_for_findommes", 0), 2)
-        elif cluster == "session_dynamics":
-            extra_links += wp_fetch_recent_links_by_category(base_url, headers, ids.get("session_dynamics_findom_educational", 0), 2)
-
-        extra_links = [u for u in extra_links if u]
-        extra_links = list(dict.fromkeys(extra_links))[:2]
-
-        prompt_template = PROMPT_FILE.read_text(encoding="utf-8")
-
-        if extra_links:
-            prompt_template += (
-                "\n\nAdditional internal links.\n"
-                "Insert each link naturally in a relevant section of the article.\n"
-                "Do not place them next to each other.\n"
-                "Links:\n"
-                + "\n".join(extra_links)
-                + "\n"
-            )
+    if extra_links:
+        prompt_template += (
+            "\n\nAdditional internal links.\n"
+            "Insert each link naturally in a relevant section of the article.\n"
+            "Do not place them next to each other.\n"
+            "Links:\n"
+            + "\n".join(extra_links)
+            + "\n"
+        )
+        print("Extra internal links:", extra_links)
 
-        os.environ["PROMPT_OVERRIDE"] = prompt_template
+    return prompt_template
 
-        if extra_links:
-            print("Extra internal links:", extra_links)        
 
-        post = openai_generate_json(keyword, links)
-        post_id, wp_status, date_gmt = wp_create_post(post, guides_id)
+def main() -> int:
+    if not KEYWORDS_CSV.exists():
+        print(f"Missing {KEYWORDS_CSV}. Create it first.", file=sys.stderr)
+        return 2
 
-        print(f"AUTO_SCHEDULE={AUTO_SCHEDULE}, wp_status={wp_status}, date_gmt={date_gmt}")
+    cfg = load_config()
+    guides_id = int(cfg["wp_guides_category_id"])
 
-        send_notification_email(post_id, post["title"], cluster, wp_status, date_gmt)
+    rows = read_rows()
 
-        # Update CSV row status to match pipeline states
-        rows[idx]["status"] = "future" if wp_status == "future" else "draft"
-        rows[idx]["wp_post_id"] = str(post_id)
-        rows[idx]["last_error"] = ""
-        # published_at remains empty until a later job marks it
+    # BATCH_SIZE defaults to 1 to keep the one-post-per-run cadence the
+    # scheduler expects; bump it to drain a backlog in one invocation
+    batch_size = max(1, int(os.getenv("BATCH_SIZE", "1")))
+    todo = [(i, r) for i, r in enumerate(rows) if (r.get("status") or "").strip().lower() == "todo"][:batch_size]
+    if not todo:
+        print("No todo keywords found. Nothing to do.")
+        return 0
 
-        print(f"Created post_id={post_id} for keyword='{keyword}' in category_id={guides_id}")
+    base_url, headers = _wp_headers()
 
-    except Exception as e:
-        rows[idx]["status"] = "error"
-        rows[idx]["last_error"] = f"{type(e).__name__}: {e}"
-        print(f"ERROR for keyword='{keyword}': {e}", file=sys.stderr)
+    # phase 1: generate all drafts, concurrently when batching; each
+    # outcome is checkpointed to the CSV as soon as it is known
+    jobs = []
+    with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+        for idx, row in todo:
+            keyword = (row.get("keyword") or "").strip()
+            if not keyword:
+                mark_row(idx, status="error", last_error="Empty keyword")
+                continue
+            try:
+                cluster = (row.get("cluster") or "").strip().lower() or "default"
+                links_map = load_links()
+                links = links_map.get(cluster, links_map["default"])
+                prompt_template = build_prompt_template(cluster, cfg, base_url, headers)
+                fut = pool.submit(openai_generate_json, keyword, links, prompt_template)
+                jobs.append((idx, keyword, cluster, fut))
+            except Exception as e:
+                mark_row(idx, status="error", last_error=f"{type(e).__name__}: {e}")
+                print(f"ERROR for keyword='{keyword}': {e}", file=sys.stderr)
+
+        # the slot lookup for the first post overlaps the multi-second
+        # draft generation instead of running after it
+        sched_fut = None
+        if AUTO_SCHEDULE and jobs:
+            sched_fut = _executor.submit(get_last_scheduled_post_date_gmt, base_url, headers)
+
+        # phase 2: post to WordPress sequentially (it rate-limits harshly
+        # and scheduling slots depend on the previously created post)
+        for idx, keyword, cluster, fut in jobs:
+            try:
+                post = fut.result()
+                post_id, wp_status, date_gmt = wp_create_post(post, guides_id, sched_fut)
+                sched_fut = None
+
+                print(f"AUTO_SCHEDULE={AUTO_SCHEDULE}, wp_status={wp_status}, date_gmt={date_gmt}")
+
+                # fire-and-forget: SMTP connect+auth latency overlaps the
+                # rest of the run; the function swallows its own errors
+                _executor.submit(send_notification_email, post_id, post["title"], cluster, wp_status, date_gmt)
+
+                # status matches pipeline states; published_at remains
+                # empty until a later job marks it
+                mark_row(
+                    idx,
+                    status="future" if wp_status == "future" else "draft",
+                    wp_post_id=str(post_id),
+                    last_error="",
+                )
+
+                print(f"Created post_id={post_id} for keyword='{keyword}' in category_id={guides_id}")
+
+            except Exception as e:
+                mark_row(idx, status="error", last_error=f"{type(e).__name__}: {e}")
+                print(f"ERROR for keyword='{keyword}': {e}", file=sys.stderr)
 
-    write_rows(rows, fieldnames)
     return 0
 
 